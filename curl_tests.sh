@@ -38,6 +38,45 @@ if echo "$ANALYSIS_RESPONSE" | grep -q "analysis_id"; then
     sleep 3  # Wait a bit for processing
     curl -s "$BASE_URL/analysis/$ANALYSIS_ID" | jq '.' 2>/dev/null || curl -s "$BASE_URL/analysis/$ANALYSIS_ID"
     echo ""
+    
+    # Test 3b: Field selection
+    echo "3b. Status with selected fields only (fields=status,prompt):"
+    curl -s "$BASE_URL/analysis/$ANALYSIS_ID?fields=status,prompt" | jq '.' 2>/dev/null || curl -s "$BASE_URL/analysis/$ANALYSIS_ID?fields=status,prompt"
+    echo ""
+    echo "   Unknown field (expect 400):"
+    CODE=$(curl -s -o /dev/null -w "%{http_code}" "$BASE_URL/analysis/$ANALYSIS_ID?fields=bogus")
+    if [ "$CODE" = "400" ]; then echo "   ✅ 400 Bad Request"; else echo "   ❌ Expected 400, got $CODE"; fi
+    echo ""
+    
+    # Test 3b (cont.): Prompt template prefix stays identical for different content
+    echo "   Prompt prefix of a second job with different content (expect the same cache_key and shared_prefix_tokens):"
+    SECOND_ID=$(curl -s -X POST "$BASE_URL/analyze" -H "Content-Type: application/json" \
+      -d '{"content": "Completely different text, to check the template prefix does not change.", "analysis_type": "comprehensive"}' | grep -o '"analysis_id":"[^"]*"' | cut -d'"' -f4)
+    FIRST_PREFIX=$(curl -s "$BASE_URL/analysis/$ANALYSIS_ID?fields=prompt" | grep -o '"cache_key":"[^"]*"\|"shared_prefix_tokens":[0-9]*' | tr '\n' ' ')
+    SECOND_PREFIX=$(curl -s "$BASE_URL/analysis/$SECOND_ID?fields=prompt" | grep -o '"cache_key":"[^"]*"\|"shared_prefix_tokens":[0-9]*' | tr '\n' ' ')
+    if [ -n "$FIRST_PREFIX" ] && [ "$FIRST_PREFIX" = "$SECOND_PREFIX" ]; then echo "   ✅ $FIRST_PREFIX"; else echo "   ❌ '$FIRST_PREFIX' vs '$SECOND_PREFIX'"; fi
+    SHARED=$(echo "$FIRST_PREFIX" | grep -o '"shared_prefix_tokens":[0-9]*' | cut -d: -f2)
+    ELIGIBLE=$(curl -s "$BASE_URL/analysis/$ANALYSIS_ID?fields=prompt" | grep -o '"cache_eligible_tokens":[0-9]*' | cut -d: -f2)
+    echo "   Cache-eligible tokens (0 below 1024, else rounded down to 128-token steps): $ELIGIBLE of $SHARED"
+    if [ -n "$SHARED" ] && { { [ "$SHARED" -lt 1024 ] && [ "$ELIGIBLE" -eq 0 ]; } || { [ "$SHARED" -ge 1024 ] && [ $((ELIGIBLE % 128)) -eq 0 ] && [ $((SHARED - ELIGIBLE)) -ge 0 ] && [ $((SHARED - ELIGIBLE)) -lt 128 ]; }; }; then
+        echo "   ✅ Rounding is consistent"
+    else
+        echo "   ❌ Unexpected cache_eligible_tokens"
+    fi
+    echo ""
+    
+    # Test 3c: Raw response on request
+    echo "3c. Status including the raw response (include_raw=true):"
+    curl -s "$BASE_URL/analysis/$ANALYSIS_ID?include_raw=true" | jq '.results.raw_response' 2>/dev/null || curl -s "$BASE_URL/analysis/$ANALYSIS_ID?include_raw=true"
+    echo ""
+    
+    # Test 3d: Conditional polling with the ETag
+    echo "3d. Repeat poll with If-None-Match (expect 304 unless the job changed in between):"
+    ETAG=$(curl -s -D - -o /dev/null "$BASE_URL/analysis/$ANALYSIS_ID" | grep -i '^etag:' | cut -d' ' -f2 | tr -d '\r')
+    echo "   ETag: $ETAG"
+    CODE=$(curl -s -o /dev/null -w "%{http_code}" -H "If-None-Match: $ETAG" "$BASE_URL/analysis/$ANALYSIS_ID")
+    if [ "$CODE" = "304" ]; then echo "   ✅ 304 Not Modified"; else echo "   ❌ Expected 304, got $CODE"; fi
+    echo ""
 fi
 
 # Test 4: List all jobs
@@ -45,4 +84,61 @@ echo "4. List all jobs:"
 curl -s "$BASE_URL/jobs" | jq '.' 2>/dev/null || curl -s "$BASE_URL/jobs"
 echo ""
 
+# Test 5: Bulk export
+echo "5. Export finished results as NDJSON:"
+EXPORT_CURSOR=$(curl -s -D - -o /tmp/export.ndjson "$BASE_URL/jobs/export?status=completed" | grep -i '^x-export-cursor:' | cut -d' ' -f2 | tr -d '\r')
+EXPORT_ROWS=$(grep -c . /tmp/export.ndjson)
+echo "   Rows: $EXPORT_ROWS, next cursor: $EXPORT_CURSOR"
+head -n 1 /tmp/export.ndjson | jq '.' 2>/dev/null || head -n 1 /tmp/export.ndjson
+echo ""
+
+echo "   Resume from X-Export-Cursor (expect no rows unless jobs finished meanwhile):"
+RESUMED_ROWS=$(curl -s "$BASE_URL/jobs/export?status=completed&cursor=$EXPORT_CURSOR" | grep -c .)
+if [ "$RESUMED_ROWS" = "0" ]; then echo "   ✅ No rows after the cursor"; else echo "   ⚠️  $RESUMED_ROWS new rows after the cursor"; fi
+
+if [ "$EXPORT_ROWS" -gt 0 ]; then
+    echo "   Resume after the first row (expect $((EXPORT_ROWS - 1)) rows):"
+    ROW_CURSOR=$(head -n 1 /tmp/export.ndjson | grep -o '"cursor":"[^"]*"' | cut -d'"' -f4)
+    RESUMED_ROWS=$(curl -s "$BASE_URL/jobs/export?status=completed&cursor=$ROW_CURSOR" | grep -c .)
+    if [ "$RESUMED_ROWS" = "$((EXPORT_ROWS - 1))" ]; then echo "   ✅ $RESUMED_ROWS rows"; else echo "   ❌ Got $RESUMED_ROWS rows"; fi
+fi
+
+echo "   Cursor from a previous service run (expect 410):"
+CODE=$(curl -s -o /dev/null -w "%{http_code}" "$BASE_URL/jobs/export?cursor=previousrun:0")
+if [ "$CODE" = "410" ]; then echo "   ✅ 410 Gone"; else echo "   ❌ Expected 410, got $CODE"; fi
+
+echo "   Gzip-compressed export (expect $EXPORT_ROWS rows after gunzip):"
+GZIP_ROWS=$(curl -s "$BASE_URL/jobs/export?status=completed&gzip=true" | gunzip | grep -c .)
+if [ "$GZIP_ROWS" = "$EXPORT_ROWS" ]; then echo "   ✅ $GZIP_ROWS rows"; else echo "   ❌ Got $GZIP_ROWS rows"; fi
+rm -f /tmp/export.ndjson
+echo ""
+
+# Test 6: Idempotent submission
+echo "6. Idempotent submission:"
+IDEMPOTENCY_KEY="curl-test-$(date +%s)-$$"
+FIRST_ID=$(curl -s -X POST "$BASE_URL/analyze" \
+  -H "Content-Type: application/json" \
+  -H "Idempotency-Key: $IDEMPOTENCY_KEY" \
+  -d '{"content": "Idempotency check content.", "analysis_type": "summary"}' | grep -o '"analysis_id":"[^"]*"' | cut -d'"' -f4)
+REPLAY_ID=$(curl -s -X POST "$BASE_URL/analyze" \
+  -H "Content-Type: application/json" \
+  -H "Idempotency-Key: $IDEMPOTENCY_KEY" \
+  -d '{"content": "Idempotency check content.", "analysis_type": "summary"}' | grep -o '"analysis_id":"[^"]*"' | cut -d'"' -f4)
+echo "   Same key twice (expect the same analysis ID):"
+if [ -n "$FIRST_ID" ] && [ "$FIRST_ID" = "$REPLAY_ID" ]; then echo "   ✅ Replayed $FIRST_ID"; else echo "   ❌ Got '$FIRST_ID' then '$REPLAY_ID'"; fi
+
+echo "   Same key with different content (expect 422):"
+CODE=$(curl -s -o /dev/null -w "%{http_code}" -X POST "$BASE_URL/analyze" \
+  -H "Content-Type: application/json" \
+  -H "Idempotency-Key: $IDEMPOTENCY_KEY" \
+  -d '{"content": "Different content.", "analysis_type": "summary"}')
+if [ "$CODE" = "422" ]; then echo "   ✅ 422 Unprocessable Entity"; else echo "   ❌ Expected 422, got $CODE"; fi
+
+echo "   Key in the idempotency_key body field (expect the same analysis ID):"
+BODY='{"content": "Idempotency body field check.", "analysis_type": "summary", "idempotency_key": "'"$IDEMPOTENCY_KEY"'-body"}'
+FIRST_ID=$(curl -s -X POST "$BASE_URL/analyze" -H "Content-Type: application/json" -d "$BODY" | grep -o '"analysis_id":"[^"]*"' | cut -d'"' -f4)
+REPLAY_ID=$(curl -s -X POST "$BASE_URL/analyze" -H "Content-Type: application/json" -d "$BODY" | grep -o '"analysis_id":"[^"]*"' | cut -d'"' -f4)
+if [ -n "$FIRST_ID" ] && [ "$FIRST_ID" = "$REPLAY_ID" ]; then echo "   ✅ Replayed $FIRST_ID"; else echo "   ❌ Got '$FIRST_ID' then '$REPLAY_ID'"; fi
+echo ""
+
 echo "🎉 Curl tests completed!"
@@ -16,7 +16,7 @@ echo "🔍 Getting results for analysis: $ANALYSIS_ID"
 echo "=============================================="
 
 # Get the analysis results
-RESPONSE=$(curl -s "$BASE_URL/analysis/$ANALYSIS_ID")
+RESPONSE=$(curl -s "$BASE_URL/analysis/$ANALYSIS_ID?include_raw=true")
 
 if [ $? -eq 0 ]; then
     echo "$RESPONSE" | jq '.' 2>/dev/null || echo "$RESPONSE"
@@ -8,7 +8,7 @@ import requests
 import time
 import json
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, List
 
 
 class ResultsMonitor:
@@ -18,6 +18,7 @@ class ResultsMonitor:
         self.base_url = base_url
         self.known_jobs = set()
         self.completed_jobs = set()
+        self.export_cursor = None
     
     def get_all_jobs(self) -> Dict[str, Any]:
         """Get all analysis jobs."""
@@ -32,16 +33,29 @@ class ResultsMonitor:
             print(f"Error: {e}")
             return {}
     
-    def get_job_status(self, job_id: str) -> Dict[str, Any]:
-        """Get status of a specific job."""
+    def get_new_results(self) -> List[Dict[str, Any]]:
+        """Fetch results completed since the last call in a single export request."""
         try:
-            response = requests.get(f"{self.base_url}/analysis/{job_id}", timeout=5)
-            if response.status_code == 200:
-                return response.json()
-            else:
-                return {"status": "error", "error": f"HTTP {response.status_code}"}
+            response = requests.get(
+                f"{self.base_url}/jobs/export",
+                params={"cursor": self.export_cursor, "include_raw": "true"},
+                stream=True,
+                timeout=30
+            )
+            if response.status_code == 410:
+                # The service restarted and its cursor no longer applies; export from the start
+                print("Export cursor expired after a service restart; starting over")
+                self.export_cursor = None
+                return self.get_new_results()
+            if response.status_code != 200:
+                print(f"Error exporting results: {response.status_code}")
+                return []
+            results = [json.loads(line) for line in response.iter_lines() if line]
+            self.export_cursor = response.headers.get("X-Export-Cursor", self.export_cursor)
+            return results
         except requests.exceptions.RequestException as e:
-            return {"status": "error", "error": str(e)}
+            print(f"Error: {e}")
+            return []
     
     def display_job_results(self, job_data: Dict[str, Any]):
         """Display formatted job results."""
@@ -126,15 +140,13 @@ class ResultsMonitor:
                             print(f"\n🆕 New job detected: {job_id}")
                             print(f"   Type: {job.get('analysis_type', 'unknown')}")
                             print(f"   Status: {job.get('status', 'unknown')}")
-                        
-                        # Check if job completed and we haven't seen results yet
-                        if (job["status"] == "completed" and 
-                            job_id not in self.completed_jobs):
-                            
-                            # Get detailed results
-                            detailed_job = self.get_job_status(job_id)
-                            self.display_job_results(detailed_job)
-                            self.completed_jobs.add(job_id)
+                
+                # Display results completed since the last check
+                for detailed_job in self.get_new_results():
+                    job_id = detailed_job["analysis_id"]
+                    if job_id not in self.completed_jobs:
+                        self.display_job_results(detailed_job)
+                        self.completed_jobs.add(job_id)
                 
                 # Show summary
                 total_jobs = jobs_data.get("total_jobs", 0)
@@ -3,7 +3,8 @@ import requests
 import time
 import sys
 import json
-from typing import Dict, Any
+import uuid
+from typing import Dict, Any, Optional
 
 
 class ContentAnalysisClient:
@@ -40,8 +41,14 @@ class ContentAnalysisClient:
         print("Service is not healthy after maximum attempts!")
         return False
     
-    def analyze_content(self, content: str, analysis_type: str = "comprehensive") -> Dict[str, Any]:
-        """Submit a content analysis job."""
+    def analyze_content(self, content: str, analysis_type: str = "comprehensive",
+                        idempotency_key: Optional[str] = None) -> Dict[str, Any]:
+        """Submit a content analysis job.
+        
+        Every retry carries the same Idempotency-Key, so a lost response never
+        causes the server to start a duplicate analysis.
+        """
+        idempotency_key = idempotency_key or str(uuid.uuid4())
         payload = {
             "content": content,
             "analysis_type": analysis_type
@@ -56,7 +63,10 @@ class ContentAnalysisClient:
                     self.analyze_url, 
                     json=payload, 
                     timeout=10,
-                    headers={"Content-Type": "application/json"}
+                    headers={
+                        "Content-Type": "application/json",
+                        "Idempotency-Key": idempotency_key
+                    }
                 )
                 
                 if response.status_code == 200:
@@ -64,6 +74,10 @@ class ContentAnalysisClient:
                     print("Analysis job submitted successfully!")
                     print(f"Job ID: {result['analysis_id']}")
                     return result
+                elif 400 <= response.status_code < 500 and response.status_code not in (408, 429):
+                    # Client errors (bad analysis type, reused key) will not succeed on retry;
+                    # timeouts and rate limiting are transient and safe to retry with the same key
+                    raise Exception(f"Analysis job rejected with status {response.status_code}: {response.text}")
                 else:
                     print(f"Received status code {response.status_code}: {response.text}")
                     
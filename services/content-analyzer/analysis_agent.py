@@ -0,0 +1,518 @@
+"""
+Content Analysis Agent: HTTP routes, analysis tools and the in-memory job store.
+
+Importing this module pulls in FastAPI and dapr_agents, so app.py only imports
+it from create_app().
+"""
+
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+from datetime import datetime
+
+from fastapi import Header, HTTPException, Query
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, PrivateAttr
+from dapr_agents import tool, DurableAgent
+
+from prompts import PROMPT_TEMPLATES, estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Request/Response models
+class AnalysisRequest(BaseModel):
+    content: str
+    analysis_type: str = "comprehensive"  # comprehensive, thematic, sentiment, summary
+    idempotency_key: Optional[str] = None  # Alternative to the Idempotency-Key header
+
+class AnalysisResponse(BaseModel):
+    analysis_id: str
+    status: str
+    results: Optional[Dict] = None
+    error: Optional[str] = None
+    timestamp: str
+
+# Custom analysis tools - Properly defined for DurableAgent
+@tool
+def extract_themes(content: str) -> List[str]:
+    """Extract key themes and topics from the given content."""
+    # This tool will be enhanced by the LLM to identify themes
+    return ["theme1", "theme2", "theme3"]  # Placeholder, LLM will override
+
+@tool
+def analyze_sentiment(content: str) -> Dict[str, str]:
+    """Analyze the emotional tone and sentiment of the content."""
+    # This tool will be enhanced by the LLM to analyze sentiment
+    return {"sentiment": "neutral", "confidence": "medium"}  # Placeholder, LLM will override
+
+@tool
+def generate_summary(content: str) -> str:
+    """Generate a concise summary of the content."""
+    # This tool will be enhanced by the LLM to create summaries
+    return "Content summary will be generated by LLM"  # Placeholder, LLM will override
+
+@tool
+def provide_recommendations(content: str, themes: List[str], sentiment: str) -> List[str]:
+    """Provide actionable recommendations based on content analysis."""
+    # This tool will be enhanced by the LLM to generate recommendations
+    return ["Recommendation 1", "Recommendation 2"]  # Placeholder, LLM will override
+
+@tool
+def calculate_confidence_score(content: str) -> float:
+    """Calculate confidence score for the analysis based on content quality and analysis depth."""
+    # Simplified to only require content parameter
+    return 0.85  # Placeholder, LLM will override
+
+# In-memory storage for analysis jobs (in production, use the state store)
+analysis_jobs: Dict[str, Dict] = {}
+
+# Idempotency keys -> {"analysis_id", "fingerprint", "expires_at"}, kept alongside the job store.
+# Every key gets the same TTL, so insertion order is also expiry order.
+idempotency_keys: "OrderedDict[str, Dict]" = OrderedDict()
+IDEMPOTENCY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+
+# Compressed large fields (request content, raw LLM response): analysis_id -> field name -> gzip bytes
+analysis_blobs: Dict[str, Dict[str, bytes]] = {}
+BLOB_FIELDS = {"content", "raw_response"}
+STATUS_FIELDS = {"analysis_id", "status", "results", "error", "prompt", "timestamp", "completed_at"}
+TERMINAL_STATUSES = {"completed", "failed"}
+MAX_CACHED_RESPONSES = 4  # Pre-serialized status bodies kept per finished job
+
+# Append-only log of (analysis_id, completed_at) in the order jobs finished; export cursors index into it.
+# The log lives only in this process, so cursors carry this run's epoch and are rejected by any other run.
+finished_jobs: List[Tuple[str, str]] = []
+EXPORT_EPOCH = uuid.uuid4().hex[:12]
+EXPORT_FLUSH_EVERY = 100  # Rows between gzip sync flushes, so compressed exports keep streaming
+
+def put_blob(analysis_id: str, name: str, text: str):
+    """Store a large text field compressed in the blob area of the job store."""
+    analysis_blobs.setdefault(analysis_id, {})[name] = gzip.compress(text.encode("utf-8"), compresslevel=6)
+
+def get_blob(analysis_id: str, name: str) -> Optional[str]:
+    """Decompress a field from the blob area, or None if it was never stored."""
+    blob = analysis_blobs.get(analysis_id, {}).get(name)
+    return gzip.decompress(blob).decode("utf-8") if blob is not None else None
+
+def serialize_json(body: Dict) -> bytes:
+    """Encode a response body compactly as UTF-8 JSON bytes."""
+    return json.dumps(body, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header (possibly a list, possibly weak) against an ETag."""
+    if not if_none_match:
+        return False
+    candidates = [value.strip().removeprefix("W/") for value in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+def format_export_cursor(position: int) -> str:
+    """Encode a position in the finished-jobs log as a cursor tied to this process run."""
+    return f"{EXPORT_EPOCH}:{position}"
+
+def parse_export_cursor(cursor: Optional[str]) -> int:
+    """Decode an export cursor into a log position (410 if it came from another run)."""
+    if not cursor:
+        return 0
+    epoch, _, position = cursor.partition(":")
+    if not position.isdigit():
+        raise HTTPException(status_code=400, detail="Invalid export cursor")
+    if epoch != EXPORT_EPOCH:
+        raise HTTPException(
+            status_code=410,
+            detail="Export cursor is from a previous service run; restart the export without a cursor"
+        )
+    if int(position) > len(finished_jobs):
+        raise HTTPException(status_code=400, detail="Invalid export cursor")
+    return int(position)
+
+def parse_export_time(value: Optional[str]) -> Optional[datetime]:
+    """Parse an ISO 8601 export bound as naive local time, to compare with job timestamps."""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    return parsed.astimezone().replace(tzinfo=None) if parsed.tzinfo else parsed
+
+def request_fingerprint(request: AnalysisRequest) -> str:
+    """Hash the fields that define the work, so a reused key with a different payload is detected."""
+    digest = hashlib.sha256()
+    digest.update(request.analysis_type.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(request.content.encode("utf-8"))
+    return digest.hexdigest()
+
+def purge_expired_idempotency_keys(now: float):
+    """Drop idempotency keys whose retention window has passed, oldest first."""
+    while idempotency_keys:
+        entry = next(iter(idempotency_keys.values()))
+        if entry["expires_at"] > now:
+            break
+        idempotency_keys.popitem(last=False)
+
+# Custom Content Analysis Agent that inherits from DurableAgent
+class ContentAnalysisAgent(DurableAgent):
+    """Custom Content Analysis Agent with custom HTTP routes."""
+    
+    _shared_prefix_tokens: Optional[int] = PrivateAttr(default=None)
+    
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+    
+    def shared_prefix_tokens(self) -> int:
+        """Estimate the tokens sent ahead of every analysis prompt: system message and tool schemas."""
+        if self._shared_prefix_tokens is None:
+            system_prompt = self.system_prompt or self.construct_system_prompt()
+            system_text = "\n".join([system_prompt, self.name, self.role, self.goal, *self.instructions])
+            tool_schemas = json.dumps([agent_tool.to_function_call() for agent_tool in self.get_llm_tools()])
+            self._shared_prefix_tokens = estimate_tokens(system_text) + estimate_tokens(tool_schemas)
+        return self._shared_prefix_tokens
+    
+    def register_routes(self):
+        """Register custom routes for content analysis."""
+        super().register_routes()
+        
+        # Add custom routes using the FastAPI app
+        self.app.add_api_route(
+            "/status", 
+            self.health_check, 
+            methods=["GET"],
+            tags=["health"],
+            summary="Health check endpoint"
+        )
+        
+        self.app.add_api_route(
+            "/analyze", 
+            self.analyze_content, 
+            methods=["POST"],
+            response_model=AnalysisResponse,
+            tags=["analysis"],
+            summary="Submit content for analysis"
+        )
+        
+        self.app.add_api_route(
+            "/analysis/{analysis_id}", 
+            self.get_analysis_status, 
+            methods=["GET"],
+            tags=["analysis"],
+            summary="Get analysis status and results"
+        )
+        
+        self.app.add_api_route(
+            "/jobs", 
+            self.list_jobs, 
+            methods=["GET"],
+            tags=["jobs"],
+            summary="List all analysis jobs"
+        )
+        
+        self.app.add_api_route(
+            "/jobs/export", 
+            self.export_jobs, 
+            methods=["GET"],
+            tags=["jobs"],
+            summary="Stream finished analysis results as NDJSON"
+        )
+    
+    async def health_check(self):
+        """Health check endpoint."""
+        return {"status": "healthy", "service": "Content Analysis Agent", "timestamp": datetime.now().isoformat()}
+    
+    async def analyze_content(
+        self,
+        request: AnalysisRequest,
+        idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    ):
+        """Analyze content using the Content Analysis Agent."""
+        try:
+            idempotency_key = idempotency_key or request.idempotency_key
+            
+            # Replay the original job for a retried request instead of starting new work.
+            # There is no await between this lookup and the job registration below, so
+            # concurrent retries on the event loop cannot both miss the key.
+            if idempotency_key:
+                now = time.time()
+                purge_expired_idempotency_keys(now)
+                existing = idempotency_keys.get(idempotency_key)
+                if existing is not None and existing["expires_at"] > now:
+                    if existing["fingerprint"] != request_fingerprint(request):
+                        raise HTTPException(
+                            status_code=422,
+                            detail="Idempotency-Key was already used with a different request"
+                        )
+                    job = analysis_jobs.get(existing["analysis_id"])
+                    if job is not None:
+                        logger.info(f"Idempotent replay of analysis {existing['analysis_id']}")
+                        return AnalysisResponse(
+                            analysis_id=existing["analysis_id"],
+                            status=job["status"],
+                            results=job.get("results"),
+                            error=job.get("error"),
+                            timestamp=job["timestamp"]
+                        )
+            
+            # Render the analysis prompt from its precompiled template
+            template = PROMPT_TEMPLATES.get(request.analysis_type)
+            if template is None:
+                raise HTTPException(status_code=400, detail="Invalid analysis type")
+            prompt = template.render(request.content)
+            
+            # Generate unique analysis ID
+            analysis_id = str(uuid.uuid4())
+            
+            # Store job in memory
+            analysis_jobs[analysis_id] = {
+                "status": "processing",
+                "request": {
+                    "analysis_type": request.analysis_type,
+                    "content_length": len(request.content)
+                },
+                "prompt": template.stats(prompt, self.shared_prefix_tokens()),
+                "timestamp": datetime.now().isoformat(),
+                "responses": {}  # Pre-serialized status bodies, filled once the job is terminal
+            }
+            put_blob(analysis_id, "content", request.content)
+            
+            if idempotency_key:
+                analysis_jobs[analysis_id]["idempotency_key"] = idempotency_key
+                idempotency_keys[idempotency_key] = {
+                    "analysis_id": analysis_id,
+                    "fingerprint": request_fingerprint(request),
+                    "expires_at": time.time() + IDEMPOTENCY_TTL_SECONDS
+                }
+                idempotency_keys.move_to_end(idempotency_key)
+            
+            # Run the agent analysis
+            logger.info(f"Starting analysis {analysis_id} for type: {request.analysis_type}")
+            
+            # Run analysis in background
+            asyncio.create_task(self.run_analysis(analysis_id, prompt))
+            
+            return AnalysisResponse(
+                analysis_id=analysis_id,
+                status="processing",
+                timestamp=datetime.now().isoformat()
+            )
+            
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Error starting analysis: {e}")
+            raise HTTPException(status_code=500, detail=str(e))
+    
+    async def get_analysis_status(
+        self,
+        analysis_id: str,
+        fields: Optional[str] = None,
+        include_raw: bool = False,
+        if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
+    ):
+        """Get the status and results of an analysis job.
+        
+        Large fields are left out unless requested: ``include_raw=true`` adds
+        ``results.raw_response``, and ``fields`` selects a comma-separated subset
+        of the status fields plus ``raw_response`` or ``content``. Finished jobs
+        are served from cached bytes (unless blob fields are selected), and a
+        matching If-None-Match yields 304.
+        """
+        if analysis_id not in analysis_jobs:
+            raise HTTPException(status_code=404, detail="Analysis job not found")
+        
+        if fields:
+            selected = {name.strip() for name in fields.split(",") if name.strip()}
+            unknown = selected - STATUS_FIELDS - BLOB_FIELDS
+            if unknown:
+                raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+        else:
+            selected = set(STATUS_FIELDS)
+        if include_raw:
+            selected |= {"results", "raw_response"}
+        
+        job = analysis_jobs[analysis_id]
+        variant = ",".join(sorted(selected))
+        cached = job["responses"].get(variant)
+        if cached is None:
+            body = serialize_json(self.build_status_body(analysis_id, job, selected))
+            cached = ('"' + hashlib.sha256(body).hexdigest()[:32] + '"', body)
+            # Only finished jobs are immutable, so only their bodies are safe to reuse.
+            # Bodies carrying blob fields are not kept, so those stay compressed at rest.
+            if (job["status"] in TERMINAL_STATUSES and not selected & BLOB_FIELDS
+                    and len(job["responses"]) < MAX_CACHED_RESPONSES):
+                job["responses"][variant] = cached
+        
+        etag, body = cached
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+        return Response(content=body, media_type="application/json", headers={"ETag": etag})
+    
+    def build_status_body(self, analysis_id: str, job: Dict, selected: Set[str]) -> Dict:
+        """Assemble the status response for the selected fields, decompressing blobs as needed."""
+        body = {"analysis_id": analysis_id}
+        for name in ("status", "results", "error", "prompt", "timestamp", "completed_at"):
+            if name in selected:
+                body[name] = job.get(name)
+        
+        if "raw_response" in selected and job.get("results") is not None:
+            body["results"] = {**job["results"], "raw_response": get_blob(analysis_id, "raw_response")}
+        if "content" in selected:
+            body["content"] = get_blob(analysis_id, "content")
+        return body
+    
+    async def list_jobs(self):
+        """List all analysis jobs."""
+        return {
+            "total_jobs": len(analysis_jobs),
+            "jobs": [
+                {
+                    "analysis_id": job_id,
+                    "status": job["status"],
+                    "analysis_type": job["request"]["analysis_type"],
+                    "timestamp": job["timestamp"]
+                }
+                for job_id, job in analysis_jobs.items()
+            ]
+        }
+    
+    async def export_jobs(
+        self,
+        status: str = "completed",
+        analysis_type: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        cursor: Optional[str] = None,
+        include_raw: bool = False,
+        gzip_output: bool = Query(False, alias="gzip"),
+    ):
+        """Stream finished jobs as NDJSON, one result per line, in the order they finished.
+        
+        Filters apply to the finish time (``since`` inclusive, ``until`` exclusive,
+        ISO 8601), the terminal ``status`` and the ``analysis_type``. Every line
+        carries the ``cursor`` to resume after it, and the X-Export-Cursor header
+        gives the cursor that resumes after the whole export. Cursors are only
+        valid within one service run; a cursor from an earlier run gets 410.
+        """
+        if status not in TERMINAL_STATUSES:
+            raise HTTPException(status_code=400, detail=f"status must be one of: {', '.join(sorted(TERMINAL_STATUSES))}")
+        start = parse_export_cursor(cursor)
+        try:
+            since_at = parse_export_time(since)
+            until_at = parse_export_time(until)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="since and until must be ISO 8601 timestamps")
+        
+        # Jobs finishing during the export are left for the next cursor
+        end = len(finished_jobs)
+        selected = set(STATUS_FIELDS) | ({"raw_response"} if include_raw else set())
+        
+        def rows() -> Iterator[bytes]:
+            for position in range(start, end):
+                analysis_id, finished_at = finished_jobs[position]
+                job = analysis_jobs[analysis_id]
+                if job["status"] != status:
+                    continue
+                if analysis_type and job["request"]["analysis_type"] != analysis_type:
+                    continue
+                finished = datetime.fromisoformat(finished_at)
+                if (since_at and finished < since_at) or (until_at and finished >= until_at):
+                    continue
+                
+                row = self.build_status_body(analysis_id, job, selected)
+                row["analysis_type"] = job["request"]["analysis_type"]
+                row["finished_at"] = finished_at
+                row["cursor"] = format_export_cursor(position + 1)
+                yield serialize_json(row) + b"\n"
+        
+        headers = {"X-Export-Cursor": format_export_cursor(end)}
+        if not gzip_output:
+            return StreamingResponse(rows(), media_type="application/x-ndjson", headers=headers)
+        
+        def compressed_rows() -> Iterator[bytes]:
+            compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 writes a gzip container
+            for count, line in enumerate(rows(), start=1):
+                chunk = compressor.compress(line)
+                if count % EXPORT_FLUSH_EVERY == 0:
+                    chunk += compressor.flush(zlib.Z_SYNC_FLUSH)
+                if chunk:
+                    yield chunk
+            yield compressor.flush()
+        
+        headers["Content-Encoding"] = "gzip"
+        return StreamingResponse(compressed_rows(), media_type="application/x-ndjson", headers=headers)
+    
+    async def run_analysis(self, analysis_id: str, prompt: str):
+        """Run the content analysis using the agent."""
+        try:
+            # Run the agent with timeout
+            response = await asyncio.wait_for(
+                self.run(prompt),
+                timeout=60.0  # 60 second timeout
+            )
+            
+            logger.info(f"Agent response received for analysis {analysis_id}: {type(response)}")
+            logger.info(f"Raw agent response content: {response}")
+            
+            # Parse the response to extract results
+            results = self.parse_agent_response(response)
+            
+            # Keep the raw response out of the job record; it is only returned on request
+            raw_response = results.pop("raw_response", None)
+            if raw_response is not None:
+                put_blob(analysis_id, "raw_response", raw_response)
+            
+            # Update job status
+            analysis_jobs[analysis_id]["status"] = "completed"
+            analysis_jobs[analysis_id]["results"] = results
+            
+            logger.info(f"Analysis {analysis_id} completed successfully with results: {results}")
+            
+        except asyncio.TimeoutError:
+            logger.error(f"Analysis {analysis_id} timed out")
+            analysis_jobs[analysis_id]["status"] = "failed"
+            analysis_jobs[analysis_id]["error"] = "Analysis timed out after 60 seconds"
+        except Exception as e:
+            logger.error(f"Error in analysis {analysis_id}: {e}")
+            analysis_jobs[analysis_id]["status"] = "failed"
+            analysis_jobs[analysis_id]["error"] = str(e)
+        finally:
+            # Stamp the finish time once, for failed jobs too; the export log and its filters use it
+            job = analysis_jobs[analysis_id]
+            if job["status"] in TERMINAL_STATUSES:
+                job["completed_at"] = datetime.now().isoformat()
+                finished_jobs.append((analysis_id, job["completed_at"]))
+    
+    def parse_agent_response(self, response) -> Dict:
+        """Parse the agent response to extract structured results."""
+        try:
+            # Extract content from the response
+            content = str(response)
+            
+            # This is a simplified parser - in production, you'd want more sophisticated parsing
+            # based on the actual response format from your LLM
+            results = {
+                "raw_response": content,
+                "themes": [],
+                "sentiment": "neutral",
+                "confidence": 0.8,
+                "summary": "",
+                "recommendations": []
+            }
+            
+            # Basic parsing logic (enhance based on your LLM's response format)
+            if "themes" in content.lower():
+                # Extract themes from response
+                pass
+            
+            if "sentiment" in content.lower():
+                # Extract sentiment from response
+                pass
+                
+            return results
+            
+        except Exception as e:
+            logger.error(f"Error parsing agent response: {e}")
+            return {"error": "Failed to parse response", "raw_response": str(response)}
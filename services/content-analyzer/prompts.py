@@ -0,0 +1,119 @@
+"""
+Prompt templates for the Content Analysis Agent.
+
+Each template keeps its instruction block first and byte-identical between
+calls, and appends the variable content last. Providers can then reuse the
+cached prompt prefix across jobs. Templates are compiled once at import time
+and carry a version, so anything caching results can key on them.
+"""
+
+import hashlib
+import re
+import textwrap
+from typing import Dict
+
+# Providers only cache prefixes above a minimum size, in fixed steps (OpenAI: 1024, then 128)
+MIN_CACHEABLE_PROMPT_TOKENS = 1024
+PROMPT_CACHE_STEP_TOKENS = 128
+
+# Separates the stable instruction prefix from the variable content
+CONTENT_DELIMITER = "\n\nContent:\n"
+
+_EXCESS_BLANK_LINES = re.compile(r"\n{3,}")
+
+
+def normalize_whitespace(text: str) -> str:
+    """Dedent text, strip trailing spaces per line, and collapse runs of blank lines."""
+    text = textwrap.dedent(text)
+    text = "\n".join(line.rstrip() for line in text.splitlines())
+    return _EXCESS_BLANK_LINES.sub("\n\n", text).strip()
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (about 4 characters per token for English text)."""
+    return (len(text) + 3) // 4
+
+
+class PromptTemplate:
+    """A compiled prompt: a stable instruction prefix followed by the content."""
+
+    def __init__(self, name: str, version: str, instructions: str):
+        self.name = name
+        self.version = version
+        self.prefix = normalize_whitespace(instructions) + CONTENT_DELIMITER
+        self.prefix_tokens = estimate_tokens(self.prefix)
+        prefix_hash = hashlib.sha256(self.prefix.encode("utf-8")).hexdigest()[:12]
+        self.cache_key = f"{name}@{version}:{prefix_hash}"
+
+    def render(self, content: str) -> str:
+        """Render the prompt with the content, as submitted, appended after the instruction prefix."""
+        return self.prefix + content
+
+    def stats(self, prompt: str, agent_prefix_tokens: int = 0) -> Dict:
+        """Report template identity and estimated prefix-cache-eligible tokens for a rendered prompt.
+
+        ``agent_prefix_tokens`` is the estimated size of what the agent sends ahead
+        of this message on every call (system message and tool schemas). Only that
+        shared prefix plus the template prefix can be cached; the content never is.
+        Conversation memory held by the agent sits between the system message and
+        this prompt, so the estimate assumes it is empty.
+        """
+        shared_prefix_tokens = agent_prefix_tokens + self.prefix_tokens
+        if shared_prefix_tokens < MIN_CACHEABLE_PROMPT_TOKENS:
+            cache_eligible_tokens = 0
+        else:
+            cache_eligible_tokens = shared_prefix_tokens - shared_prefix_tokens % PROMPT_CACHE_STEP_TOKENS
+        return {
+            "template": self.name,
+            "version": self.version,
+            "cache_key": self.cache_key,
+            "prompt_tokens": agent_prefix_tokens + estimate_tokens(prompt),
+            "shared_prefix_tokens": shared_prefix_tokens,
+            "cache_eligible_tokens": cache_eligible_tokens,
+        }
+
+
+PROMPT_TEMPLATES: Dict[str, PromptTemplate] = {
+    "comprehensive": PromptTemplate(
+        name="comprehensive",
+        version="2",
+        instructions="""
+            Analyze the content below comprehensively.
+
+            Use all available tools to:
+            1. Extract key themes and topics using extract_themes
+            2. Analyze sentiment and emotional tone using analyze_sentiment
+            3. Generate a concise summary using generate_summary
+            4. Provide actionable recommendations using provide_recommendations
+            5. Calculate confidence score using calculate_confidence_score
+
+            After using all tools, provide a comprehensive final analysis that summarizes your findings,
+            including the themes identified, sentiment analysis, summary, recommendations, and confidence score.
+            Make sure to consolidate all the information into a clear, actionable report.
+            """,
+    ),
+    "thematic": PromptTemplate(
+        name="thematic",
+        version="2",
+        instructions="""
+            Focus on extracting themes and topics from the content below.
+            Use the extract_themes tool and provide detailed theme analysis with clear insights.
+            """,
+    ),
+    "sentiment": PromptTemplate(
+        name="sentiment",
+        version="2",
+        instructions="""
+            Analyze the sentiment and emotional tone of the content below.
+            Use the analyze_sentiment tool and provide detailed sentiment analysis with clear insights.
+            """,
+    ),
+    "summary": PromptTemplate(
+        name="summary",
+        version="2",
+        instructions="""
+            Generate a concise summary of the content below.
+            Use the generate_summary tool to create a clear, informative summary with key insights.
+            """,
+    ),
+}
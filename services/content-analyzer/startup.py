@@ -0,0 +1,75 @@
+"""
+Startup bookkeeping shared by app.py and the agent module.
+
+Kept free of third-party imports so it is cheap to load before anything else.
+"""
+
+import json
+import os
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+class StartupProfile:
+    """Record how long each startup phase takes."""
+    
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+    
+    @contextmanager
+    def phase(self, name: str):
+        """Time the enclosed block and record it under the given phase name."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = time.perf_counter() - started
+    
+    def report(self) -> Dict:
+        """Return per-phase timings in milliseconds plus the total."""
+        phases_ms = {name: round(seconds * 1000, 2) for name, seconds in self.phases.items()}
+        return {"phases_ms": phases_ms, "total_ms": round(sum(phases_ms.values()), 2)}
+
+startup_profile = StartupProfile()
+
+# Set once the agent is built and its routes are mounted; drives the readiness probe
+service_ready = threading.Event()
+
+def dapr_http_url(path: str) -> str:
+    """Build a URL on the local Dapr sidecar's HTTP API."""
+    port = os.getenv("DAPR_HTTP_PORT", "3500")
+    return f"http://127.0.0.1:{port}/v1.0/{path}"
+
+def dapr_sidecar_healthy(timeout: float = 1.0) -> bool:
+    """Check the Dapr sidecar health endpoint (blocking; run it off the event loop)."""
+    try:
+        with urllib.request.urlopen(dapr_http_url("healthz"), timeout=timeout) as response:
+            return 200 <= response.status < 300
+    except Exception:
+        return False
+
+def read_agents_registry(store_name: str, key: str) -> Tuple[Dict, Optional[str]]:
+    """Read the agents registry and its ETag through the sidecar's state API."""
+    with urllib.request.urlopen(dapr_http_url(f"state/{store_name}/{key}"), timeout=5) as response:
+        data = response.read()
+        return (json.loads(data) if data else {}), response.headers.get("ETag")
+
+def remove_registry_entry(store_name: str, key: str, agent_name: str):
+    """Remove one agent from the registry, guarded by the ETag against concurrent writers."""
+    registry, etag = read_agents_registry(store_name, key)
+    if agent_name not in registry:
+        return
+    del registry[agent_name]
+    item = {"key": key, "value": registry, "metadata": {"contentType": "application/json"}}
+    if etag:
+        item.update(etag=etag, options={"concurrency": "first-write"})
+    request = urllib.request.Request(
+        dapr_http_url(f"state/{store_name}"),
+        data=json.dumps([item]).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+        method="POST"
+    )
+    with urllib.request.urlopen(request, timeout=5):
+        pass
@@ -60,6 +60,23 @@ test_analysis() {
     fi
 }
 
+# Print a job's prompt block and check its cache-eligible token rounding
+check_prompt_stats() {
+    prompt_body=$(curl -s "http://localhost:8005/analysis/$1?fields=prompt")
+    echo "   Prompt stats: $prompt_body"
+    shared=$(echo "$prompt_body" | grep -o '"shared_prefix_tokens":[0-9]*' | cut -d: -f2)
+    eligible=$(echo "$prompt_body" | grep -o '"cache_eligible_tokens":[0-9]*' | cut -d: -f2)
+    if [ -z "$shared" ] || [ -z "$eligible" ]; then
+        echo "   ❌ Prompt block is missing token counts"
+    elif [ "$shared" -lt 1024 ] && [ "$eligible" -eq 0 ]; then
+        echo "   ✅ Shared prefix of $shared tokens is below the 1024-token minimum, nothing cacheable"
+    elif [ "$shared" -ge 1024 ] && [ $((eligible % 128)) -eq 0 ] && [ "$eligible" -le "$shared" ] && [ $((shared - eligible)) -lt 128 ]; then
+        echo "   ✅ $eligible of $shared shared prefix tokens cacheable (128-token steps)"
+    else
+        echo "   ❌ Unexpected cache_eligible_tokens $eligible for a $shared-token shared prefix"
+    fi
+}
+
 # Test different analysis types
 test_analysis_types() {
     echo ""
@@ -76,10 +93,166 @@ test_analysis_types() {
         
         if echo "$response" | grep -q "analysis_id"; then
             echo "   ✅ $analysis_type analysis submitted"
+            analysis_id=$(echo "$response" | grep -o '"analysis_id":"[^"]*"' | cut -d'"' -f4)
+            check_prompt_stats "$analysis_id"
         else
             echo "   ❌ $analysis_type analysis failed"
         fi
     done
+    
+    # The template prefix must not depend on the content, so its cache key and size stay the same
+    echo "   Comparing prompt prefixes of two summary jobs with different content..."
+    first=$(curl -s -X POST http://localhost:8005/analyze -H "Content-Type: application/json" \
+        -d '{"content": "First text for the prefix check.", "analysis_type": "summary"}' | grep -o '"analysis_id":"[^"]*"' | cut -d'"' -f4)
+    second=$(curl -s -X POST http://localhost:8005/analyze -H "Content-Type: application/json" \
+        -d '{"content": "A second, rather longer text for the prefix check.", "analysis_type": "summary"}' | grep -o '"analysis_id":"[^"]*"' | cut -d'"' -f4)
+    first_prefix=$(curl -s "http://localhost:8005/analysis/$first?fields=prompt" | grep -o '"cache_key":"[^"]*"\|"shared_prefix_tokens":[0-9]*' | tr '\n' ' ')
+    second_prefix=$(curl -s "http://localhost:8005/analysis/$second?fields=prompt" | grep -o '"cache_key":"[^"]*"\|"shared_prefix_tokens":[0-9]*' | tr '\n' ' ')
+    if [ -n "$first_prefix" ] && [ "$first_prefix" = "$second_prefix" ]; then
+        echo "   ✅ Identical prefix: $first_prefix"
+    else
+        echo "   ❌ Prefixes differ: '$first_prefix' vs '$second_prefix'"
+    fi
+}
+
+# Test field selection, raw responses and ETag polling
+test_result_fetching() {
+    echo ""
+    echo "🗂️  Testing result fetching..."
+    
+    response=$(curl -s -X POST http://localhost:8005/analyze \
+        -H "Content-Type: application/json" \
+        -d '{"content": "Short content to test result fetching.", "analysis_type": "summary"}')
+    analysis_id=$(echo "$response" | grep -o '"analysis_id":"[^"]*"' | cut -d'"' -f4)
+    if [ -z "$analysis_id" ]; then
+        echo "   ❌ Analysis submission failed:"
+        echo "$response"
+        return
+    fi
+    
+    echo "   ⏳ Waiting for analysis to finish..."
+    for attempt in $(seq 1 30); do
+        status=$(curl -s "http://localhost:8005/analysis/$analysis_id?fields=status" | grep -o '"status":"[^"]*"' | cut -d'"' -f4)
+        if [ "$status" = "completed" ] || [ "$status" = "failed" ]; then
+            break
+        fi
+        sleep 2
+    done
+    echo "   Final status: $status"
+    
+    default_body=$(curl -s "http://localhost:8005/analysis/$analysis_id")
+    if echo "$default_body" | grep -q '"raw_response"'; then
+        echo "   ❌ Default response includes raw_response"
+    else
+        echo "   ✅ Default response leaves out raw_response"
+    fi
+    
+    fields_body=$(curl -s "http://localhost:8005/analysis/$analysis_id?fields=status")
+    if echo "$fields_body" | grep -q '"timestamp"'; then
+        echo "   ❌ fields=status returned unrequested fields: $fields_body"
+    else
+        echo "   ✅ fields=status returned: $fields_body"
+    fi
+    
+    if [ "$status" = "completed" ]; then
+        if curl -s "http://localhost:8005/analysis/$analysis_id?include_raw=true" | grep -q '"raw_response"'; then
+            echo "   ✅ include_raw=true returns raw_response"
+        else
+            echo "   ❌ include_raw=true did not return raw_response"
+        fi
+    fi
+    
+    etag=$(curl -s -D - -o /dev/null "http://localhost:8005/analysis/$analysis_id" | grep -i '^etag:' | cut -d' ' -f2 | tr -d '\r')
+    code=$(curl -s -o /dev/null -w "%{http_code}" -H "If-None-Match: $etag" "http://localhost:8005/analysis/$analysis_id")
+    if [ "$code" = "304" ]; then
+        echo "   ✅ Repeat poll with ETag $etag returned 304"
+    else
+        echo "   ❌ Repeat poll with ETag $etag returned $code, expected 304"
+    fi
+}
+
+# Test the NDJSON bulk export
+test_export() {
+    echo ""
+    echo "📦 Testing bulk export..."
+    
+    headers=$(curl -s -D - -o /tmp/export.ndjson "http://localhost:8005/jobs/export")
+    next_cursor=$(echo "$headers" | grep -i '^x-export-cursor:' | cut -d' ' -f2 | tr -d '\r')
+    rows=$(grep -c . /tmp/export.ndjson)
+    echo "   Exported $rows completed results, next cursor: $next_cursor"
+    
+    if [ -n "$next_cursor" ]; then
+        resumed=$(curl -s "http://localhost:8005/jobs/export?cursor=$next_cursor" | grep -c .)
+        if [ "$resumed" = "0" ]; then
+            echo "   ✅ Resuming from X-Export-Cursor returned no duplicate rows"
+        else
+            echo "   ⚠️  Resuming from X-Export-Cursor returned $resumed rows (jobs finished meanwhile?)"
+        fi
+    else
+        echo "   ❌ X-Export-Cursor header missing"
+    fi
+    
+    code=$(curl -s -o /dev/null -w "%{http_code}" "http://localhost:8005/jobs/export?cursor=previousrun:0")
+    if [ "$code" = "410" ]; then
+        echo "   ✅ Cursor from a previous service run rejected with 410"
+    else
+        echo "   ❌ Cursor from a previous service run returned $code, expected 410"
+    fi
+    
+    gzip_rows=$(curl -s "http://localhost:8005/jobs/export?gzip=true" | gunzip | grep -c .)
+    if [ "$gzip_rows" = "$rows" ]; then
+        echo "   ✅ Gzip export decompresses to the same $gzip_rows rows"
+    else
+        echo "   ❌ Gzip export returned $gzip_rows rows, expected $rows"
+    fi
+    
+    code=$(curl -s -o /dev/null -w "%{http_code}" "http://localhost:8005/jobs/export?status=processing")
+    if [ "$code" = "400" ]; then
+        echo "   ✅ Non-terminal status filter rejected with 400"
+    else
+        echo "   ❌ status=processing returned $code, expected 400"
+    fi
+    rm -f /tmp/export.ndjson
+}
+
+# Test idempotent submission with the header and the body field
+test_idempotency() {
+    echo ""
+    echo "🔁 Testing idempotent submission..."
+    
+    key="test-agent-$(date +%s)-$$"
+    payload='{"content": "Idempotency check content.", "analysis_type": "summary"}'
+    first_id=$(curl -s -X POST http://localhost:8005/analyze \
+        -H "Content-Type: application/json" -H "Idempotency-Key: $key" \
+        -d "$payload" | grep -o '"analysis_id":"[^"]*"' | cut -d'"' -f4)
+    replay_id=$(curl -s -X POST http://localhost:8005/analyze \
+        -H "Content-Type: application/json" -H "Idempotency-Key: $key" \
+        -d "$payload" | grep -o '"analysis_id":"[^"]*"' | cut -d'"' -f4)
+    if [ -n "$first_id" ] && [ "$first_id" = "$replay_id" ]; then
+        echo "   ✅ Retry with the same Idempotency-Key replayed $first_id"
+    else
+        echo "   ❌ Retry with the same key returned '$replay_id', first was '$first_id'"
+    fi
+    
+    code=$(curl -s -o /dev/null -w "%{http_code}" -X POST http://localhost:8005/analyze \
+        -H "Content-Type: application/json" -H "Idempotency-Key: $key" \
+        -d '{"content": "Different content.", "analysis_type": "summary"}')
+    if [ "$code" = "422" ]; then
+        echo "   ✅ Reusing the key with different content returned 422"
+    else
+        echo "   ❌ Reusing the key with different content returned $code, expected 422"
+    fi
+    
+    body='{"content": "Idempotency body field check.", "analysis_type": "summary", "idempotency_key": "'"$key"'-body"}'
+    first_id=$(curl -s -X POST http://localhost:8005/analyze -H "Content-Type: application/json" \
+        -d "$body" | grep -o '"analysis_id":"[^"]*"' | cut -d'"' -f4)
+    replay_id=$(curl -s -X POST http://localhost:8005/analyze -H "Content-Type: application/json" \
+        -d "$body" | grep -o '"analysis_id":"[^"]*"' | cut -d'"' -f4)
+    if [ -n "$first_id" ] && [ "$first_id" = "$replay_id" ]; then
+        echo "   ✅ Retry with the idempotency_key body field replayed $first_id"
+    else
+        echo "   ❌ Retry with the body field returned '$replay_id', first was '$first_id'"
+    fi
 }
 
 # List all jobs
@@ -116,10 +289,13 @@ show_menu() {
     echo "3) Test different analysis types"
     echo "4) List all jobs"
     echo "5) Run Python test scripts"
-    echo "6) Run all tests"
-    echo "7) Exit"
+    echo "6) Test result fetching (fields, include_raw, ETag)"
+    echo "7) Test bulk export"
+    echo "8) Test idempotent submission"
+    echo "9) Run all tests"
+    echo "10) Exit"
     echo ""
-    read -p "Enter your choice (1-7): " choice
+    read -p "Enter your choice (1-10): " choice
     
     case $choice in
         1)
@@ -141,13 +317,28 @@ show_menu() {
             run_python_tests
             ;;
         6)
+            health_check
+            test_result_fetching
+            ;;
+        7)
+            health_check
+            test_export
+            ;;
+        8)
+            health_check
+            test_idempotency
+            ;;
+        9)
             health_check
             test_analysis
             test_analysis_types
+            test_result_fetching
+            test_export
+            test_idempotency
             list_jobs
             run_python_tests
             ;;
-        7)
+        10)
             echo "👋 Goodbye!"
             exit 0
             ;;
@@ -173,6 +364,9 @@ if [ "$1" = "auto" ]; then
         health_check
         test_analysis
         test_analysis_types
+        test_result_fetching
+        test_export
+        test_idempotency
         list_jobs
         run_python_tests
     }